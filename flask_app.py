@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-Synopsis: A Flask app to skim the contents of a youtube video transcript. Works by summarizing youtube videos using the OpenAI API.
+Synopsis: A Quart (async Flask) app to skim the contents of a youtube video transcript. Works by summarizing youtube videos using the OpenAI API.
 
 Created: Created on June, 2024
 
@@ -12,33 +12,153 @@ Distribution: MIT Opens Source Copyright; Full permisions here:
          
 """
 # Include Libraries
-from flask import Flask, render_template, request, redirect, url_for
+from quart import Quart, Response, render_template, request, redirect, stream_template, url_for
+from quart.wrappers.response import DataBody, IterableBody
+import argparse
+import asyncio
+import atexit
+import csv
+from dataclasses import dataclass
+import gzip
+import hashlib
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from itertools import groupby
 import os
 import openai
-import traceback
+import queue
+from openai import AsyncOpenAI
+import zlib
 import re
+import secrets
+import threading
+import httpx
 import requests
-from typing import List, Optional
-from urllib.parse import urlparse, parse_qs
+from diskcache import Cache
+from dotenv import load_dotenv
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from werkzeug.exceptions import BadRequest
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 
 
 # Constants and Global Variables
 key_file=".secrets/gpt2.key" # location of OpenAI key
-summary_scope = 2  # length of time to sumarize in minutes
-system_role_description = "You are a co-reference based summarization algorithm"
+system_role_description = "Summarize in one sentence using source wording."
 Output_File = "Summaries.txt"
 Output_FullText = "Full_Transcript.txt"
 Input_File = "Yt_Ids_nls.csv"
-openai_model_name = "gpt-3.5-turbo"
-
-# Set the API key from the environment variable (PS $env:OPENAI_API_KEY ="sk-...")
-api_key = os.getenv('OPENAI_API_KEY')
-if api_key is None:
-    raise ValueError("API key not found. Please set the OPENAI_API_KEY environment variable.")
-
-openai.api_key = api_key
+batch_poll_interval = 60  # seconds between status checks of an OpenAI batch job
+max_summary_tokens = 60  # output token cap for one summary sentence
+batch_max_segments = 8  # batch at most this many segments; longer videos stream per-segment summaries
+summary_temperature = 0.2  # low temperature keeps summaries close to the source wording
+# Worst case on a result page: the batched request (2 x (20 + 480 / 50) s) failing over to a per-segment
+# request (3 x 20 s), about 125 s with backoff, which fits inside summary_deadline
+openai_max_retries = 2  # retries (with exponential backoff) for rate limits and server errors
+openai_timeout = 20  # seconds before an OpenAI request times out
+warm_up_timeout = 5  # seconds to spend warming up the OpenAI connection at startup
+batch_max_retries = 1  # retries for the batched request; the per-segment path is the real fallback
+min_decode_tokens_per_second = 50  # conservative output speed used to size the batched request's timeout
+unavailable_summary = "Summary unavailable"  # shown for a segment whose summary request failed
+transcript_cache_ttl = 7 * 24 * 60 * 60  # seconds to keep a downloaded transcript
+title_cache_ttl = 24 * 60 * 60  # seconds to keep a downloaded video title
+summary_cache_ttl = 30 * 24 * 60 * 60  # seconds to keep a segment summary
+compress_min_size = 500  # smallest HTML response body (bytes) worth gzipping
+compress_level = 6  # gzip compression level, trading CPU for size
+summary_deadline = 180  # seconds a result page may spend on the transcript and its summaries
+response_timeout = summary_deadline + 30  # seconds Quart keeps streaming a response; leaves room for the title download
+
+# Log through a queue so formatting and writing happen on the listener's thread, not the request's
+logger = logging.getLogger(__name__)
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_handler, respect_handler_level=True)
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))  # the listener's handler adds the prefix
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+for _noisy in ("httpx", "openai"):
+    logging.getLogger(_noisy).setLevel(logging.WARNING)  # they log every request at INFO
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# Precompiled regular expressions
+_SANITIZE = re.compile(r'[^\w\s]', re.UNICODE)  # anything that isn't alphanumeric or whitespace
+_YT_ID = re.compile(r'(?:[?&]v=|youtu\.be/|/embed/|/shorts/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])')  # a YouTube video ID in a URL
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Application settings, read once from the environment at startup.
+
+    Attributes:
+        openai_api_key (str): The OpenAI API key (OPENAI_API_KEY).
+        secret_key (str): The Quart session signing key (SECRET_KEY); random per process, with a
+            warning, if unset.
+        openai_model (str): The OpenAI model used for summaries (OPENAI_MODEL).
+        summary_scope_default (int): The default length of time to summarize, in minutes (SUMMARY_SCOPE).
+        max_concurrency (int): The maximum number of OpenAI requests in flight at once (MAX_CONCURRENCY).
+    """
+    openai_api_key: str
+    secret_key: str
+    openai_model: str = "gpt-4o-mini"
+    summary_scope_default: int = 2
+    max_concurrency: int = 10
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build the settings from environment variables, loading a .env file first if there is one.
+
+        Returns:
+            Settings: The application settings.
+
+        Raises:
+            ValueError: If the OpenAI API key is not set.
+        """
+        load_dotenv()
+
+        # Set the API key from the environment variable (PS $env:OPENAI_API_KEY ="sk-...")
+        api_key = os.getenv('OPENAI_API_KEY')
+        if api_key is None:
+            raise ValueError("API key not found. Please set the OPENAI_API_KEY environment variable.")
+
+        # Only pass the optional settings that are set, so the field defaults apply otherwise
+        optional = {field: cast(os.environ[name]) for field, name, cast in (
+            ("openai_model", 'OPENAI_MODEL', str),
+            ("summary_scope_default", 'SUMMARY_SCOPE', int),
+            ("max_concurrency", 'MAX_CONCURRENCY', int),
+        ) if os.environ.get(name)}
+
+        secret_key = os.getenv('SECRET_KEY')
+        if not secret_key:
+            # Fine for the debug server, but every worker process would sign sessions differently
+            logger.warning("SECRET_KEY is not set; using a random key for this process. "
+                           "Set SECRET_KEY when running more than one worker.")
+            secret_key = secrets.token_hex(32)
+
+        return cls(openai_api_key=api_key, secret_key=secret_key, **optional)
+
+
+settings = Settings.from_env()
+
+# Shared async clients; created once and reused by every request on the app's event loop
+client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=openai_max_retries, timeout=openai_timeout)
+_http = httpx.AsyncClient(http2=True, timeout=10)
+
+# The (blocking) transcript API isn't thread-safe, so each to_thread worker gets its own API and
+# session (which keeps its connections to YouTube alive); the sessions are tracked for shutdown
+_yt_local = threading.local()
+_yt_sessions: List[requests.Session] = []
+_yt_sessions_lock = threading.Lock()
+
+# On-disk cache of YouTube lookups, shared across requests and restarts
+_cache = Cache('.cache/yt')
+_cache.stats(enable=True)  # track hits/misses; read with _cache.stats()
+
+# On-disk cache of segment summaries, keyed by model and segment text (see _summary_key)
+_sum_cache = Cache('.cache/sum')
 
 # Subroutines & Functions
 def sanitize_text(text: str) -> str:
@@ -52,15 +172,70 @@ def sanitize_text(text: str) -> str:
         str: The sanitized text.
     """
     # Replace non-alphanumeric characters (excluding spaces) with an empty string
-    sanitized_text = text.encode('utf-8').decode('utf-8') 
-    sanitized_text = re.sub(r'[^\w\s]', '', text, flags=re.UNICODE)
-    
-    return sanitized_text
+    return _SANITIZE.sub('', text)
 
 
-def get_transcript(video_id: str, summary_scope: int, verbose: bool = False) -> List[str]:
+@_cache.memoize(expire=transcript_cache_ttl)
+def _raw_transcript(video_id: str) -> List[dict]:
     """
-    Get the transcript of a YouTube video in segments.
+    Download the raw transcript of a YouTube video, caching the result on disk.
+
+    Args:
+        video_id (str): The YouTube video ID.
+
+    Returns:
+        List[dict]: The transcript blurbs as returned by the YouTube transcript API.
+    """
+    yt = getattr(_yt_local, "api", None)
+    if yt is None:
+        sess = requests.Session()
+        with _yt_sessions_lock:
+            _yt_sessions.append(sess)
+        yt = _yt_local.api = YouTubeTranscriptApi(http_client=sess)
+    return yt.fetch(video_id).to_raw_data()
+
+
+def _segment_transcript(transcript: List[dict], summary_scope: int) -> List[str]:
+    """
+    Split a raw transcript into segments of summary_scope minutes.
+
+    Segment i always covers minutes i * summary_scope to (i + 1) * summary_scope, so a
+    window with no captions (e.g. a silent intro) is kept as an empty string rather than
+    dropped. Each blurb is sanitized as it is read, so the segments are safe to send to
+    the OpenAI API as-is.
+
+    Args:
+        transcript (List[dict]): The transcript blurbs as returned by _raw_transcript.
+        summary_scope (int): The length of each segment in minutes.
+
+    Returns:
+        List[str]: A list of transcript segments, one per summary_scope window.
+
+    Raises:
+        ValueError: If the transcript could not be parsed.
+        Exception: For any other unexpected errors.
+    """
+    segment_seconds = 60.0 * summary_scope
+
+    try:
+        # Group consecutive blurbs by the summary_scope window their start time falls in and
+        # join each group's list of texts in one pass (str.join needs a list for that anyway)
+        segments = []
+        for window, group in groupby(transcript, key=lambda blurb: int(blurb["start"] // segment_seconds)):
+            # Pad uncaptioned windows so a segment's index still gives its start minute
+            segments.extend([""] * (window - len(segments)))
+            segments.append(" ".join([sanitize_text(blurb["text"]) for blurb in group]).strip())
+    except KeyError as e:
+        raise ValueError(f"Error parsing the transcript: missing expected key {str(e)}")
+    except Exception as e:
+        raise Exception(f"An unexpected error occurred while processing the transcript: {str(e)}")
+
+    return segments
+
+
+async def get_transcript(video_id: str, summary_scope: int, verbose: bool = False) -> List[str]:
+    """
+    Get the transcript of a YouTube video in segments (see _segment_transcript).
 
     Args:
         video_id (str): The YouTube video ID (e.g., 'utU9L8ONRbk').
@@ -68,14 +243,16 @@ def get_transcript(video_id: str, summary_scope: int, verbose: bool = False) ->
         verbose (bool): Whether to print the transcript segments to the console.
 
     Returns:
-        List[str]: A list of transcript segments.
+        List[str]: A list of transcript segments, one per summary_scope window, or a single
+        message segment if the video has no transcript.
 
     Raises:
         ValueError: If the transcript could not be retrieved or parsed.
         Exception: For any other unexpected errors.
     """
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
+        # The transcript API is blocking, so run it off the event loop
+        transcript = await asyncio.to_thread(_raw_transcript, video_id)
     except TranscriptsDisabled:
         return [ f"Transcripts are disabled for the video with ID '{video_id}'."]
     except NoTranscriptFound:
@@ -83,33 +260,12 @@ def get_transcript(video_id: str, summary_scope: int, verbose: bool = False) ->
     except Exception as e:
         raise Exception(f"An unexpected error occurred while retrieving the transcript: {str(e)}")
 
-    segments = []
-    segment_text = ""
-    break_point = summary_scope
-
-    try:
-        for blurb in transcript:
-            sanitized_text = sanitize_text(blurb["text"])
-            if blurb["start"] / 60.0 >= break_point:
-                segments.append(segment_text.strip())
-                segment_text = sanitized_text
-                break_point += summary_scope
-            else:
-                segment_text += " " + sanitized_text
+    segments = _segment_transcript(transcript, summary_scope)
 
-        # Append any remaining text as the last segment
-        if segment_text:
-            segments.append(segment_text.strip())
-
-        if verbose:
-            print(f"\n\n----------\nFull transcript Text for video ID {video_id}")
-            for segment in segments:
-                print(segment)
-        
-    except KeyError as e:
-        raise ValueError(f"Error parsing the transcript: missing expected key {str(e)}")
-    except Exception as e:
-        raise Exception(f"An unexpected error occurred while processing the transcript: {str(e)}")
+    if verbose:
+        print(f"\n\n----------\nFull transcript Text for video ID {video_id}")
+        for segment in segments:
+            print(segment)
 
     return segments
 
@@ -126,36 +282,185 @@ def extract_video_id(youtube_url) -> str:
     Raises:
         ValueError: If no valid video ID is found in the URL.
     """
-    # Parse the URL into components
-    parsed_url = urlparse(youtube_url)
-    
-    # Extract query parameters
-    query_params = parse_qs(parsed_url.query)
+    # Matches watch?v=<id>, youtu.be/<id>, /embed/<id> and /shorts/<id> URLs
+    match = _YT_ID.search(youtube_url)
+    if match:
+        return match.group(1)
+
+    # If no video ID is found, raise an error
+    raise ValueError("No valid video ID found in the provided YouTube URL")
+
+def _segment_messages(seg: str) -> List[dict]:
+    """
+    Build the chat messages asking the model to summarize one transcript segment.
+
+    Args:
+        seg (str): The transcript segment to summarize.
 
-    # Check if 'v' parameter is present in the query
-    if 'v' in query_params:
-        return query_params['v'][0]
+    Returns:
+        List[dict]: The messages to send to the OpenAI chat completions API.
+    """
+    user_input = "Summarize the following text by returning one sentence that uses mostly words from the text itself:\n  "
+    return [
+        {"role": "system", "content": system_role_description},
+        {"role": "user", "content": user_input + seg},
+    ]
 
-    # Check for URLs in the form of https://youtu.be/<video_id>
-    if parsed_url.netloc == 'youtu.be' and parsed_url.path:
-        return parsed_url.path[1:]  # Remove the leading '/'
 
-    # Check for embedded video URLs https://www.youtube.com/embed/<video_id>
-    if 'embed' in parsed_url.path.split('/'):
-        return parsed_url.path.split('/')[-1]
+async def _summarize_one(i: int, seg: str, sem: asyncio.Semaphore) -> Tuple[int, Optional[str]]:
+    """
+    Summarize a single transcript segment using the OpenAI API.
 
-    # Check for YouTube Shorts URLs https://www.youtube.com/shorts/<video_id>
-    if 'shorts' in parsed_url.path.split('/'):
-        return parsed_url.path.split('/')[-1]
+    Args:
+        i (int): The index of the segment within the transcript.
+        seg (str): The transcript segment to summarize.
+        sem (asyncio.Semaphore): Semaphore bounding the number of requests in flight.
 
-    # If no video ID is found, raise an error
-    raise ValueError("No valid video ID found in the provided YouTube URL")
+    Returns:
+        Tuple[int, Optional[str]]: The segment index and the raw summary returned by the model,
+        or None if the request still failed after the client's retries.
+    """
+    try:
+        async with sem:
+            completion = await client.chat.completions.create(model=settings.openai_model,
+                messages=_segment_messages(seg), max_tokens=max_summary_tokens, temperature=summary_temperature)
+    except openai.OpenAIError as e:
+        logger.warning("Error summarizing segment %d: %s", i, e)
+        return i, None
+
+    return i, completion.choices[0].message.content
+
+
+async def _summarize_batched(segments: List[str]) -> Optional[List[str]]:
+    """
+    Summarize all the transcript segments with a single OpenAI request.
+
+    Args:
+        segments (List[str]): A list of transcript segments.
+
+    Returns:
+        Optional[List[str]]: The raw summaries in segment order, or None if the model's
+        reply could not be matched up with the segments.
+    """
+    user_input = ("For each numbered segment below, return a JSON object with a \"summaries\" key holding "
+                  "an array of one-sentence summaries (same order, same length). Use words from the text itself.\n"
+                  + "\n".join(f"[{i}] {s}" for i, s in enumerate(segments)))
+    msg = [
+        {"role": "system", "content": system_role_description},
+        {"role": "user", "content": user_input},
+    ]
+
+    # The reply can be much longer than a single summary, so give it time to decode, but
+    # don't retry it for long since the per-segment path can take over
+    max_tokens = max_summary_tokens * len(segments)
+    batch_client = client.with_options(timeout=openai_timeout + max_tokens / min_decode_tokens_per_second,
+                                       max_retries=batch_max_retries)
+    try:
+        completion = await batch_client.chat.completions.create(model=settings.openai_model,
+            messages=msg, response_format={"type": "json_object"},
+            max_tokens=max_tokens, temperature=summary_temperature)
+    except openai.OpenAIError as e:
+        # e.g. the transcript overflows the context window, or the retries ran out
+        logger.warning("Batched summary request failed, summarizing segments one by one: %s", e)
+        return None
+
+    try:
+        summaries = json.loads(completion.choices[0].message.content)["summaries"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+    if not isinstance(summaries, list) or len(summaries) != len(segments):
+        return None
+
+    return [str(summary) for summary in summaries]
+
+
+def _summary_key(seg: str) -> str:
+    """
+    Build the summary cache key for a transcript segment.
+
+    Args:
+        seg (str): The transcript segment.
 
-def summarize_video_segments(
-    segments: List[str], video_id: str, summary_scope: int, html_link: bool = True, verbose: bool = False) -> List[str]:
+    Returns:
+        str: A hash of the model name and the segment text.
+    """
+    return hashlib.blake2b(f"{settings.openai_model}|{seg}".encode(), digest_size=16).hexdigest()
+
+
+async def _iter_summaries(segments: List[str]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Summarize all the transcript segments, yielding each summary as soon as it is available.
+
+    Empty segments (windows without captions) are skipped. Cached summaries are yielded
+    first. If only a few segments remain (batch_max_segments) they are sent to the OpenAI API
+    in one batched request, which returns quickly at that size. Otherwise, or if the batched
+    reply does not contain exactly one summary per segment, each segment is summarized
+    separately and concurrently and yielded as it completes. A segment whose request fails
+    is yielded with a placeholder instead of aborting the rest.
+
+    Args:
+        segments (List[str]): A list of transcript segments.
+
+    Yields:
+        Tuple[int, str]: The segment index and its raw summary, in completion order.
+    """
+    # Identical segments (silent stretches, repeated captions) share a key, so each
+    # distinct segment is only looked up and summarized once
+    indices: Dict[str, List[int]] = {}
+    for i, seg in enumerate(segments):
+        if seg:
+            indices.setdefault(_summary_key(seg), []).append(i)
+
+    missing = []
+    for k, segment_indices in indices.items():
+        summary = _sum_cache.get(k)
+        if summary is None:
+            missing.append(k)
+        else:
+            for i in segment_indices:
+                yield i, summary
+
+    if not missing:
+        return
+
+    missing_segments = [segments[indices[k][0]] for k in missing]
+    summaries = await _summarize_batched(missing_segments) if len(missing) <= batch_max_segments else None
+    if summaries is not None:
+        for k, summary in zip(missing, summaries):
+            _sum_cache.set(k, summary, expire=summary_cache_ttl)
+            for i in indices[k]:
+                yield i, summary
+        return
+
+    sem = asyncio.Semaphore(settings.max_concurrency)
+    tasks = [asyncio.create_task(_summarize_one(j, s, sem)) for j, s in enumerate(missing_segments)]
+    try:
+        for future in asyncio.as_completed(tasks):
+            j, summary = await future
+            k = missing[j]
+            if summary is None:
+                # Don't cache the failure so the segment is retried next time
+                summary = unavailable_summary
+            else:
+                _sum_cache.set(k, summary, expire=summary_cache_ttl)
+            for i in indices[k]:
+                yield i, summary
+    finally:
+        # Don't leave requests running if the client went away mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+async def summarize_video_segments(
+    segments: List[str], video_id: str, summary_scope: int, html_link: bool = True,
+    verbose: bool = False) -> AsyncIterator[Tuple[int, str]]:
     """
     Summarize the video segments using the OpenAI API.
 
+    The summaries are yielded as they become available, which is not necessarily in
+    segment order; use the yielded index to place each one.
+
     Args:
         segments (List[str]): A list of transcript segments.
         video_id (str): The YouTube video ID.
@@ -163,46 +468,29 @@ def summarize_video_segments(
         html_link (bool): Whether to include HTML links in the summaries.
         verbose (bool): Whether to print the summaries to the console.
 
-    Returns:
-        List[str]: A list of summarized segments.
+    Yields:
+        Tuple[int, str]: The segment index and its summarized segment.
 
     Raises:
         Exception: For any errors during the summarization process.
     """
-    user_input = "Summarize the following text by returning one sentence that uses mostly words from the text itself:\n  "
-    segmented_summaries = []
-
     try:
-        for i, seg in enumerate(segments):
-            # Sanitize each segment before sending it to the OpenAI API
-            sanitized_segment = sanitize_text(seg)
-            
-            # Create a list of messages to send to the OpenAI API
-            msg = [
-                {"role": "system", "content": system_role_description},
-                {"role": "user", "content": user_input + sanitized_segment},
-            ]
-            completion = openai.chat.completions.create(model=openai_model_name,
-                messages=msg)
-            response_content = sanitize_text(completion.choices[0].message.content)
+        async for i, content in _iter_summaries(segments):
+            response_content = sanitize_text(content)
 
             # Prepend the summary with the time stamp minute
             if html_link:
                 prefix = f"<a href='#' onclick=\"document.getElementById('youtube-video').src = '{create_youtube_link(video_id, i * summary_scope)}&autoplay=1'; return false;\">{i * summary_scope}:</a>"
-                segmented_summaries.append(f"{prefix} {response_content}")
+                yield i, f"{prefix} {response_content}"
             else:
-                segmented_summaries.append(f"{i * summary_scope}: {response_content}")
+                yield i, f"{i * summary_scope}: {response_content}"
 
             if verbose:
                 print(f"{i * summary_scope}: {response_content}")
 
-    except openai.OpenAIError as e:
-        raise Exception(f"Error communicating with the OpenAI API; please try again in a minute: {str(e)}")
     except Exception as e:
         raise Exception(f"An unexpected error occurred during summarization: {str(e)}")
 
-    return segmented_summaries
-
 
 def create_youtube_link(video_id: str, timestamp_in_minutes: int) -> str:
     """
@@ -218,9 +506,9 @@ def create_youtube_link(video_id: str, timestamp_in_minutes: int) -> str:
     return f"https://youtube.com/embed/{video_id}?start={timestamp_in_minutes * 60}"
 
 
-def get_youtube_video_title(video_id: str) -> Optional[str]:
+async def get_youtube_video_title(video_id: str) -> Optional[str]:
     """
-    Retrieve the title of a YouTube video.
+    Retrieve the title of a YouTube video, caching the result on disk.
 
     Args:
         video_id (str): The YouTube video ID.
@@ -231,114 +519,404 @@ def get_youtube_video_title(video_id: str) -> Optional[str]:
     Raises:
         Exception: If there is an issue retrieving the title.
     """
+    cache_key = ("title", video_id)
+    title = _cache.get(cache_key)
+    if title is not None:
+        return title
+
     try:
         url = f"https://www.youtube.com/watch?v={video_id}"
-        response = requests.get(url)
+        response = await _http.get(url)
 
         if response.status_code == 200:
-            # Using a regex to extract the title from the HTML content
-            title_search = re.search(r'<title>(.*?)</title>', response.text)
-            if title_search:
-                title = title_search.group(1).replace(" - YouTube", "").strip()
-                return sanitize_text(title)
+            # Slice the title out of the raw HTML; it sits near the top of the page
+            page = response.content
+            title_start = page.find(b"<title>")
+            title_end = page.find(b"</title>", title_start) if title_start != -1 else -1
+            if title_end != -1:
+                title = page[title_start + len(b"<title>"):title_end].decode("utf-8", "ignore")
+                title = sanitize_text(title.replace(" - YouTube", "").strip())
+                _cache.set(cache_key, title, expire=title_cache_ttl)
+                return title
             else:
                 raise ValueError(f"Could not extract title for video ID '{video_id}'")
         else:
             raise ValueError(f"Failed to retrieve the video page. Status code: {response.status_code}")
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"An error occurred while fetching the video title: {str(e)}")
 
 
-# Define Flask app and Routes (pages)
-app = Flask(__name__)
-app.secret_key = api_key+"123"
+async def _get_title_or_none(video_id: str) -> Optional[str]:
+    """
+    Retrieve the title of a YouTube video, or None if that fails.
+
+    Args:
+        video_id (str): The YouTube video ID.
+
+    Returns:
+        Optional[str]: The title of the video, or None if it couldn't be retrieved.
+    """
+    try:
+        return await get_youtube_video_title(video_id)
+    except Exception as e:
+        # The title is cosmetic, so don't fail the whole summary over it
+        logger.warning("Error retrieving title of video %s: %s", video_id, e)
+        return None
+
 
-"""Define the routes for the Flask application."""
+async def bulk_summarize(video_ids: List[str], summary_scope: int = settings.summary_scope_default) -> None:
+    """
+    Summarize a list of videos offline with the OpenAI Batch API.
+
+    Batch jobs are billed at half the price of regular requests and have their own rate
+    limits, but can take up to 24 hours to finish, so this is only meant for summarizing
+    backlogs of videos, not for the interactive app. The summaries are written to
+    Output_File, the transcripts to Output_FullText, and every summary is added to the
+    summary cache so the app can serve those videos instantly. Videos whose transcript
+    can't be retrieved are logged and skipped.
+
+    Args:
+        video_ids (List[str]): The YouTube video IDs to summarize.
+        summary_scope (int): The length of each segment in minutes.
+
+    Raises:
+        Exception: If the batch job fails or produces no output.
+    """
+    # Fetch the raw transcripts directly so a video without one raises (and is skipped)
+    # instead of producing a placeholder message we'd pay to summarize
+    transcripts = {}
+    for video_id in video_ids:
+        try:
+            transcript = await asyncio.to_thread(_raw_transcript, video_id)
+            transcripts[video_id] = _segment_transcript(transcript, summary_scope)
+        except Exception as e:
+            logger.warning("Skipping video %s, its transcript could not be retrieved: %s", video_id, e)
+
+    # One chat completion request per segment, tagged so the replies can be matched up
+    lines = []
+    for video_id, segments in transcripts.items():
+        for i, seg in enumerate(segments):
+            if not seg:
+                continue
+            lines.append(json.dumps({
+                "custom_id": f"{video_id}:{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": settings.openai_model, "messages": _segment_messages(seg),
+                         "max_tokens": max_summary_tokens, "temperature": summary_temperature},
+            }))
+
+    if not lines:
+        logger.warning("Nothing to summarize; no batch submitted")
+        return
+
+    batch_file = await client.files.create(file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch")
+    batch = await client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions",
+                                        completion_window="24h")
+    logger.info("Submitted batch %s with %d requests", batch.id, len(lines))
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(batch_poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+        logger.info("Batch %s: %s", batch.id, batch.status)
+
+    if batch.output_file_id is None:
+        raise Exception(f"Batch {batch.id} finished with status '{batch.status}' and no output")
+
+    output = await client.files.content(batch.output_file_id)
+    summaries = {}
+    for line in output.text.splitlines():
+        result = json.loads(line)
+        if result.get("error") or result["response"]["status_code"] != 200:
+            continue
+        video_id, i = result["custom_id"].rsplit(":", 1)
+        summaries[(video_id, int(i))] = result["response"]["body"]["choices"][0]["message"]["content"]
+
+    with open(Output_File, "w", encoding="utf-8") as summary_file, \
+            open(Output_FullText, "w", encoding="utf-8") as transcript_file:
+        for video_id, segments in transcripts.items():
+            summary_file.write(f"\n\n----------\nSummary for video ID {video_id}\n")
+            transcript_file.write(f"\n\n----------\nFull transcript Text for video ID {video_id}\n")
+            for i, seg in enumerate(segments):
+                if not seg:
+                    continue
+                summary = summaries.get((video_id, i))
+                if summary is None:
+                    summary_file.write(f"{i * summary_scope}: {unavailable_summary}\n")
+                else:
+                    _sum_cache.set(_summary_key(seg), summary, expire=summary_cache_ttl)
+                    summary_file.write(f"{i * summary_scope}: {sanitize_text(summary)}\n")
+                transcript_file.write(f"{seg}\n")
+
+
+def _read_video_ids(path: str) -> List[str]:
+    """
+    Read YouTube video IDs from the first column of a CSV file.
+
+    Args:
+        path (str): The CSV file to read.
+
+    Returns:
+        List[str]: The video IDs, skipping empty rows.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+
+
+# Define Quart app and Routes (pages)
+app = Quart(__name__)
+app.secret_key = settings.secret_key
+# Quart silently cuts a streamed body off after RESPONSE_TIMEOUT (60 s by default), so it must outlast summary_deadline
+app.config["RESPONSE_TIMEOUT"] = response_timeout
+
+
+@app.before_serving
+async def warm_up_clients():
+    """
+    Open a connection to the OpenAI API before the first request, so that request doesn't
+    pay for the TLS handshake. Failures (e.g. a placeholder API key in CI) are only logged.
+    """
+    try:
+        # One quick attempt; startup must stay well inside gunicorn's worker timeout
+        await client.with_options(max_retries=0, timeout=warm_up_timeout).models.list()
+    except openai.OpenAIError as e:
+        logger.warning("Could not warm up the OpenAI client: %s", e)
+
+
+@app.after_serving
+async def close_clients():
+    """Close the shared HTTP clients when the server shuts down."""
+    await client.close()
+    await _http.aclose()
+    with _yt_sessions_lock:
+        for sess in _yt_sessions:
+            sess.close()
+        _yt_sessions.clear()
+
+
+@app.after_request
+async def compress_response(response: Response) -> Response:
+    """
+    Gzip HTML responses for clients that accept it.
+
+    Streamed responses (the summary results page) are compressed as they are rendered and
+    flushed whenever the page pauses for the next summary, so the browser can still render
+    each summary as it arrives without every tiny template chunk costing its own flush.
+
+    Args:
+        response (Response): The response to compress.
+
+    Returns:
+        Response: The (possibly) compressed response.
+    """
+    if (response.mimetype != "text/html" or "Content-Encoding" in response.headers
+            or not request.accept_encodings["gzip"]):
+        return response
+
+    if isinstance(response.response, DataBody):
+        data = await response.get_data()
+        if len(data) < compress_min_size:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=compress_level))
+    elif isinstance(response.response, IterableBody):
+        body = response.response
+
+        async def render(chunks: asyncio.Queue):
+            # Render in one task (the template carries the request context), queueing chunks as they come
+            try:
+                async with body as rendered:
+                    async for chunk in rendered:
+                        chunks.put_nowait(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            finally:
+                chunks.put_nowait(None)
+
+        async def compressed_body():
+            compressor = zlib.compressobj(compress_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+            chunks: asyncio.Queue = asyncio.Queue()
+            renderer = asyncio.create_task(render(chunks))
+            pending = False  # whether the compressor holds data the client hasn't been sent yet
+            try:
+                while True:
+                    if pending and chunks.empty():
+                        # The page is waiting on the next summary, so send what it has so far
+                        yield compressor.flush(zlib.Z_SYNC_FLUSH)
+                        pending = False
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        break
+                    data = compressor.compress(chunk)
+                    pending = True
+                    if data:
+                        yield data
+                await renderer  # surface any error raised while rendering
+                yield compressor.flush()
+            finally:
+                renderer.cancel()
+
+        response.response = IterableBody(compressed_body())
+    else:
+        return response
+
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+# Rendered HTML of pages whose content never changes, keyed by template name
+_static_pages: Dict[str, str] = {}
+
+
+async def _render_static_page(template_name: str, **context) -> str:
+    """
+    Render a page whose template context is constant, reusing the HTML after the first render.
+
+    Quart's render_template is a coroutine, so functools.lru_cache can't be used here; it
+    would cache the coroutine object, which can only be awaited once.
+
+    Args:
+        template_name (str): The template to render.
+        **context: The (constant) template context.
+
+    Returns:
+        str: The rendered HTML.
+    """
+    html = _static_pages.get(template_name)
+    if html is None:
+        html = await render_template(template_name, **context)
+        _static_pages[template_name] = html
+    return html
+
+
+"""Define the routes for the Quart application."""
 @app.route('/')
-def homepage():
+async def homepage():
     """
     Render the homepage.
 
     Returns:
         The rendered 'index.html' template.
     """
-    return render_template('index.html',
-                           page_title="Home",
-                           page_header="YouTube Summarizer App",
-                           footer_text="Your Application",
-                           current_year=2024)
+    return await _render_static_page('index.html',
+                                     page_title="Home",
+                                     page_header="YouTube Summarizer App",
+                                     footer_text="Your Application",
+                                     current_year=2024)
 
 @app.route('/YoutubeSummarizer')
-def summarizer_form():
+async def summarizer_form():
     """
     Render the form for summarizing a YouTube video.
 
     Returns:
         The rendered 'summarizer_form.html' template.
     """
-    return render_template('summarizer_form.html',
-                           page_title="YouTube Summarizer",
-                           page_header="YouTube Summarizer",
-                           form_instructions="",
-                           video_key_label="Enter the URL for the video want to summarize. On Youtube, click the share button and copy the link. Paste it here.",
-                           video_key_help="Example: https://www.youtube.com/watch?v=utU9L8ONRbk",
-                           min_chunk_label="How many minutes do you want summarized into one sentence? (1-10)",
-                           footer_text="Your Application",
-                           current_year=2024)
+    return await _render_static_page('summarizer_form.html',
+                                     page_title="YouTube Summarizer",
+                                     page_header="YouTube Summarizer",
+                                     form_instructions="",
+                                     video_key_label="Enter the URL for the video want to summarize. On Youtube, click the share button and copy the link. Paste it here.",
+                                     video_key_help="Example: https://www.youtube.com/watch?v=utU9L8ONRbk",
+                                     min_chunk_label="How many minutes do you want summarized into one sentence? (1-10)",
+                                     min_chunk_default=settings.summary_scope_default,
+                                     footer_text="Your Application",
+                                     current_year=2024)
 
 @app.route('/YoutubeSummarizer', methods=['POST'])
-def summarizer_result():
+async def summarizer_result():
     """
     Process the form submission and display the summary results.
 
     Extracts the YouTube video ID and summary scope from the form submission, 
-    retrieves the transcript, summarizes it, and renders the results.
+    retrieves the transcript, summarizes it, and renders the results. The page is
+    streamed: the shell is sent while the transcript downloads, and each summary
+    reaches the browser as soon as it is ready.
 
     Returns:
-        The rendered 'summarizer_result.html' template with the summaries.
+        The streamed 'summarizer_result.html' template with the summaries.
         
     """
     try:
         # Get form data
         # Extract the video ID from the provided YouTube URL
-        youtube_url = request.form['Key']
+        form = await request.form
+        youtube_url = form['Key']
         video_id = extract_video_id(youtube_url)
-        min_chunk = int(request.form['minChunk'])
+        min_chunk = int(form['minChunk'])
 
         if not video_id or min_chunk <= 0:
             raise BadRequest("Invalid video key or summary scope.")
 
-        # Retrieve the video transcript and summarize it
-        segments = get_transcript(video_id, min_chunk, verbose=False)
-        summaries = summarize_video_segments(segments, video_id, min_chunk, html_link=True, verbose=False)
-        summaries = [x + "<br>" for x in summaries]
-        
-        return render_template('summarizer_result.html',
+        # Start the title and transcript downloads now and stream the page shell while they run
+        title_task = asyncio.create_task(_get_title_or_none(video_id))
+        transcript_task = asyncio.create_task(get_transcript(video_id, min_chunk, verbose=False))
+
+        async def video_title():
+            # Called from the template, which awaits it when it reaches the title
+            return await title_task
+
+        async def summaries():
+            # The response has already started, so errors from here on can't redirect
+            segments = []
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + summary_deadline
+            lines = None
+            try:
+                # Stop at the deadline ourselves so the error line is sent before Quart cuts off the response
+                segments = await asyncio.wait_for(transcript_task, deadline - loop.time())
+                lines = summarize_video_segments(segments, video_id, min_chunk, html_link=True, verbose=False)
+                while True:
+                    try:
+                        i, summary = await asyncio.wait_for(lines.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    yield i, summary + "<br>"
+            except asyncio.TimeoutError:
+                logger.warning("Summarizing video %s exceeded %d s", video_id, summary_deadline)
+                yield len(segments), "Summarizing this video took too long. Please try again later.<br>"
+            except Exception:
+                logger.exception("Error summarizing video %s", video_id)
+                yield len(segments), "An error occurred while summarizing this video. Please try again later.<br>"
+            finally:
+                # Don't leave the downloads or summary requests running if the client went away mid-stream
+                title_task.cancel()
+                transcript_task.cancel()
+                if lines is not None:
+                    await lines.aclose()
+
+        return await stream_template('summarizer_result.html',
                                page_title="Summary Results",
                                page_header="Summary Results",
-                               summaries=summaries,
+                               summaries=summaries(),
                                video_id=video_id,
+                               video_title=video_title,
                                back_button_text="Go back to summarize another video",
                                footer_text="Your Application",
                                current_year=2024)
 
     except BadRequest as e:
         #flash(str(e), 'error')
-        print(f"Error processing video summary: {e}")
-        print(traceback.format_exc())
+        logger.warning("Invalid video summary request: %s", e)
         return redirect(url_for('summarizer_form'))
 
-    except Exception as e:
+    except Exception:
         # Log the error and show a generic error message to the user
         #flash("An unexpected error occurred while processing your request. Please try again later.", 'error')
-        print(f"Error processing video summary: {e}")
-        print(traceback.format_exc())
+        logger.exception("Error processing video summary")
         return redirect(url_for('summarizer_form'))
     
 
 
 
-# To start the Flask app
+# To start the Quart development server (deploy with: hypercorn flask_app:app),
+# or summarize the videos in Input_File offline with: python flask_app.py --bulk
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="YouTube Summarizer App")
+    parser.add_argument("--bulk", action="store_true",
+                        help=f"summarize the video IDs in {Input_File} with the OpenAI Batch API instead of serving the app")
+    args = parser.parse_args()
+
+    if args.bulk:
+        asyncio.run(bulk_summarize(_read_video_ids(Input_File)))
+    else:
+        app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Synopsis: Gunicorn settings for serving the YouTube Summarizer app on uvicorn's async workers.
+          Gunicorn picks this file up automatically:  gunicorn flask_app:app
+
+Distribution: MIT Opens Source Copyright; Full permisions here:
+    https://gist.github.com/john-telfeyan/2565b2904355410c1e75f27524aeea5f#file-license-md
+"""
+bind = "0.0.0.0:8000"
+workers = 2  # each worker runs one event loop that serves many requests concurrently
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Not preloaded: the app module starts a logging thread and opens its HTTP clients and disk
+# caches at import, none of which survive being forked from the master into the workers
+preload_app = False